@@ -3,7 +3,7 @@
 Configuration Settings Module for the LLM-Powered WhatsApp Bot.
 
 This module is responsible for loading environment variables from a .env file
-and defining configuration variables required by the application. By centralizing
+into a frozen Settings instance (SETTINGS) that the rest of the application reads from. By centralizing
 configuration in one module, we ensure that sensitive data is not hard-coded in our source code,
 making our project more secure and maintainable.
 
@@ -13,39 +13,89 @@ Key configurations include:
     - MongoDB URI for database connections.
     - Email credentials for sending notifications.
     - Default rate limit settings.
+    - Optional Redis URL for sharing rate limit state across processes.
+    - Startup behaviour (eager initialization of external clients).
+    - Logging of LLM prompts and responses.
 """
 
 import os
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables from the .env file into the system's environment
 load_dotenv()
 
-# --- LLM and Database Configuration ---
+# Groq model used when DEFAULT_GROQ_MODEL is not set in the environment.
+DEFAULT_GROQ_MODEL = "deepseek-r1-distill-llama-70b"
 
-# API key for Groq, used for LLM-powered response generation
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Immutable application configuration, built once from the environment at import.
+    """
 
-# MongoDB URI to connect to the database (used for storing conversation summaries)
-MONGODB_URI = os.getenv("MONGODB_URI")
+    # --- LLM and Database Configuration ---
 
-# --- Email Notification Configuration ---
+    # API key for Groq, used for LLM-powered response generation
+    groq_api_key: Optional[str] = None
+    # Groq model used to generate responses
+    default_groq_model: str = DEFAULT_GROQ_MODEL
+    # MongoDB URI to connect to the database (used for storing conversation summaries)
+    mongodb_uri: Optional[str] = None
 
-# Email address used for sending notifications (e.g., alerts for media requests or errors)
-EMAIL_SENDER = os.getenv("EMAIL_SENDER")
-# Email password or app-specific password for authentication
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+    # --- Email Notification Configuration ---
 
-# --- Rate Limiting Configuration ---
+    # Email address used for sending notifications (e.g., alerts for media requests or errors)
+    email_sender: Optional[str] = None
+    # Email password or app-specific password for authentication
+    email_password: Optional[str] = None
 
-# Default number of messages allowed per hour to prevent abuse
-DEFAULT_RATE_LIMIT_PER_HOUR = int(os.getenv("DEFAULT_RATE_LIMIT_PER_HOUR", 30))
+    # --- Rate Limiting Configuration ---
 
-# --- Twilio WhatsApp Configuration ---
+    # Default number of messages allowed per hour to prevent abuse
+    default_rate_limit_per_hour: int = 30
+    # Redis URL used to share rate limit state between workers (e.g. "redis://localhost:6379/0").
+    # When unset, rate limiting falls back to per-process in-memory tracking.
+    redis_url: Optional[str] = None
 
-# Twilio Account SID: A unique identifier for your Twilio account
-TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
-# Twilio Auth Token: Secret key used to authenticate with the Twilio API
-TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-# Twilio WhatsApp Number: Your WhatsApp-enabled number provided by Twilio (format: "whatsapp:+1234567890")
-TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
+    # --- Twilio WhatsApp Configuration ---
+
+    # Twilio Account SID: A unique identifier for your Twilio account
+    twilio_account_sid: Optional[str] = None
+    # Twilio Auth Token: Secret key used to authenticate with the Twilio API
+    twilio_auth_token: Optional[str] = None
+    # Twilio WhatsApp Number: Your WhatsApp-enabled number provided by Twilio (format: "whatsapp:+1234567890")
+    twilio_whatsapp_number: Optional[str] = None
+
+    # --- Startup Configuration ---
+
+    # Whether to create external clients (Groq, MongoDB, SMTP worker) at startup rather than
+    # on the first webhook call. Set EAGER_INIT=0 to disable, e.g. in tests. Database indexes
+    # are ensured at startup either way.
+    eager_init: bool = True
+
+    # --- Logging Configuration ---
+
+    # Log every LLM prompt and response at INFO (otherwise they are logged at DEBUG)
+    verbose_llm_logging: bool = False
+    # Fraction of LLM calls whose prompt and response are still logged at INFO (0.0 - 1.0)
+    llm_log_sample_rate: float = 0.01
+
+
+# The application settings, read from the environment exactly once.
+SETTINGS = Settings(
+    groq_api_key=os.getenv("GROQ_API_KEY"),
+    default_groq_model=os.getenv("DEFAULT_GROQ_MODEL", DEFAULT_GROQ_MODEL),
+    mongodb_uri=os.getenv("MONGODB_URI"),
+    email_sender=os.getenv("EMAIL_SENDER"),
+    email_password=os.getenv("EMAIL_PASSWORD"),
+    default_rate_limit_per_hour=int(os.getenv("DEFAULT_RATE_LIMIT_PER_HOUR", 30)),
+    redis_url=os.getenv("REDIS_URL"),
+    twilio_account_sid=os.getenv("TWILIO_ACCOUNT_SID"),
+    twilio_auth_token=os.getenv("TWILIO_AUTH_TOKEN"),
+    twilio_whatsapp_number=os.getenv("TWILIO_WHATSAPP_NUMBER"),
+    eager_init=os.getenv("EAGER_INIT", "1").lower() not in ("0", "false", "no"),
+    verbose_llm_logging=os.getenv("VERBOSE_LLM_LOGGING", "0").lower() in ("1", "true", "yes"),
+    llm_log_sample_rate=float(os.getenv("LLM_LOG_SAMPLE_RATE", 0.01)),
+)
@@ -7,31 +7,76 @@ It provides a function to obtain the database instance which can be used through
 """
 
 import logging
-from pymongo import MongoClient
-from config import settings
+from functools import lru_cache
+from pymongo import ASCENDING, MongoClient
+from config.settings import SETTINGS
 import certifi
 
 # Initialize a logger for this module
 logger = logging.getLogger(__name__)
 
-def get_db():
+# Name of the database used by the bot.
+DATABASE_NAME = 'whatsappbotdatabase'
+
+# Maximum number of pooled connections kept by the shared MongoClient.
+MAX_POOL_SIZE = 50
+
+@lru_cache(maxsize=1)
+def get_client() -> MongoClient:
     """
-    Establish and return a connection to the MongoDB database.
+    Return the shared MongoClient, creating it on first use.
+
+    MongoClient is thread-safe and maintains its own connection pool, so a single
+    instance is reused for the lifetime of the process instead of paying TLS and
+    topology discovery costs on every call.
 
     Returns:
-        db: The MongoDB database instance.
+        MongoClient: The cached MongoDB client.
 
     Raises:
-        Exception: If connection to MongoDB fails.
+        Exception: If the client cannot be created.
     """
     try:
         # Create a MongoClient instance using the connection URI from settings.
         # The tlsCAFile parameter ensures that SSL certificates are verified.
-        client = MongoClient(settings.MONGODB_URI, tlsCAFile=certifi.where())
-        # Access a specific database; here we name it 'whatsappbotdatabase'.
-        db = client['whatsappbotdatabase']
-        return db
+        return MongoClient(SETTINGS.mongodb_uri, tlsCAFile=certifi.where(), maxPoolSize=MAX_POOL_SIZE)
     except Exception as e:
         # Log the error details and re-raise the exception.
         logger.error("Failed to connect to MongoDB", exc_info=True)
         raise e
+
+def get_db():
+    """
+    Return the MongoDB database instance backed by the shared client.
+
+    Returns:
+        db: The MongoDB database instance.
+
+    Raises:
+        Exception: If connection to MongoDB fails.
+    """
+    return get_client()[DATABASE_NAME]
+
+def get_summaries_collection():
+    """
+    Return the 'conversation_summaries' collection.
+
+    Returns:
+        Collection: The collection holding per-user conversation summaries.
+    """
+    return get_db().conversation_summaries
+
+def ensure_indexes() -> None:
+    """
+    Create the indexes the application relies on.
+
+    A unique index on conversation_summaries.user_id turns the per-message lookups and
+    upserts into index seeks and prevents concurrent upserts from creating duplicate
+    records. createIndex is idempotent, so this is safe to call on every startup.
+
+    Raises:
+        OperationFailure: If the index cannot be built (e.g. duplicate user_id records exist).
+        PyMongoError: If MongoDB cannot be reached.
+    """
+    get_summaries_collection().create_index([("user_id", ASCENDING)], unique=True)
+    logger.info("MongoDB indexes ensured.")
@@ -3,49 +3,130 @@
 LLM Integration Module using Groq API.
 
 This module integrates with the Groq API to generate dynamic, human-like responses
-based on the conversation context provided in the prompt.
+based on the conversation context provided as a list of role-tagged chat messages.
 """
 
-import re
+import random
 import logging
+from functools import lru_cache
+from typing import Iterable, Iterator
+import httpx
 from groq import Groq
-from config import settings
+from config.settings import SETTINGS
 
 # Initialize a logger for this module
 logger = logging.getLogger(__name__)
 
-def parse_prompt_to_messages(prompt: str) -> list:
+# Connection pool limits for the HTTP client shared by all Groq requests.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Delimiters of the reasoning blocks that are stripped from responses.
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+@lru_cache(maxsize=1)
+def get_client() -> Groq:
+    """
+    Return the shared Groq client, creating it on first use.
+
+    The client is built once and reused for every request so that HTTP/SSL setup
+    is not repeated per message. It uses a long-lived HTTP/2 httpx client with a
+    keep-alive connection pool, so consecutive calls reuse the TLS connection to
+    the API. Call get_client.cache_clear() to force a rebuild.
+
+    Returns:
+        Groq: The cached Groq client instance.
     """
-    Parse the prompt string into a list of message dictionaries that the Groq API can understand.
+    http_client = httpx.Client(http2=True, limits=HTTP_LIMITS)
+    return Groq(api_key=SETTINGS.groq_api_key, http_client=http_client)
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """
+    Return the length of the longest suffix of text that is a proper prefix of tag.
+
+    Such a suffix may be the start of a tag split across stream chunks, so it has to be
+    held back until the next chunk arrives.
+    """
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+def strip_think_blocks(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Remove <think>...</think> blocks (and the whitespace after them) from streamed text.
+
+    This is a small state machine that works incrementally across chunk boundaries, so
+    the visible text can be assembled while the response is still being received. An
+    unterminated <think> block is passed through unchanged.
 
     Args:
-        prompt (str): The full conversation prompt with context.
+        chunks (Iterable[str]): Pieces of the response text in arrival order.
+
+    Yields:
+        str: Pieces of the response text with reasoning blocks removed.
+    """
+    pending = ""
+    inside_think = False
+    skip_whitespace = False
+    # Offset in pending from which to resume searching for the closing tag.
+    search_from = 0
+    for chunk in chunks:
+        pending += chunk
+        while pending:
+            if skip_whitespace:
+                pending = pending.lstrip()
+                if not pending:
+                    break
+                skip_whitespace = False
+            if inside_think:
+                end = pending.find(_THINK_CLOSE, search_from)
+                if end == -1:
+                    # Wait for the closing tag; the block is kept in case it never arrives.
+                    search_from = max(len(_THINK_OPEN), len(pending) - len(_THINK_CLOSE) + 1)
+                    break
+                pending = pending[end + len(_THINK_CLOSE):]
+                inside_think = False
+                skip_whitespace = True
+                continue
+            start = pending.find(_THINK_OPEN)
+            if start == -1:
+                # Emit everything except a possible partial opening tag at the end.
+                keep = _partial_tag_length(pending, _THINK_OPEN)
+                if len(pending) > keep:
+                    yield pending[:len(pending) - keep]
+                    pending = pending[len(pending) - keep:]
+                break
+            if start:
+                yield pending[:start]
+            # Keep the opening tag so an unterminated block can be emitted as-is.
+            pending = pending[start:]
+            inside_think = True
+            search_from = len(_THINK_OPEN)
+    if pending and not skip_whitespace:
+        yield pending
+
+def _llm_log_level() -> int:
+    """
+    Choose the level at which to log the prompt and responses of an LLM call.
+
+    Full payloads are logged at INFO when verbose LLM logging is enabled, and for a
+    sampled fraction of calls otherwise; all other calls log them at DEBUG.
 
     Returns:
-        list: A list of dictionaries, each containing "role" and "content" keys.
+        int: The logging level to use for this call.
     """
-    messages = []
-    # Split the prompt into lines and process each line
-    for line in prompt.split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        # Identify the role based on a simple prefix convention.
-        if line.startswith("User:"):
-            messages.append({"role": "user", "content": line[len("User:"):].strip()})
-        elif line.startswith("Bot:"):
-            messages.append({"role": "assistant", "content": line[len("Bot:"):].strip()})
-        else:
-            # For lines without a clear role, treat them as system instructions.
-            messages.append({"role": "system", "content": line})
-    return messages
-
-def get_llm_response(prompt: str) -> str:
+    if SETTINGS.verbose_llm_logging or random.random() < SETTINGS.llm_log_sample_rate:
+        return logging.INFO
+    return logging.DEBUG
+
+def get_llm_response(messages: list) -> str:
     """
-    Send a prompt to the Groq API and return the generated response.
+    Send chat messages to the Groq API and return the generated response.
 
     Args:
-        prompt (str): The conversation prompt including context.
+        messages (list): Message dictionaries with "role" and "content" keys,
+            e.g. a system instruction followed by the user's message.
 
     Returns:
         str: The cleaned response text from the Groq API.
@@ -53,26 +134,35 @@ def get_llm_response(prompt: str) -> str:
     Raises:
         Exception: If there is an error during the API call.
     """
-    # Initialize the Groq client using the API key from our settings.
-    client = Groq(api_key=settings.GROQ_API_KEY)
-    # Convert the prompt into a structured list of messages.
-    messages = parse_prompt_to_messages(prompt)
-    # Determine the model to use; fall back to a default if not specified.
-    model = getattr(settings, "DEFAULT_GROQ_MODEL", "deepseek-r1-distill-llama-70b")
+    # Reuse the shared Groq client instead of building a new one per call.
+    client = get_client()
 
     try:
-        # Call the Groq API to generate a response.
-        chat_completion = client.chat.completions.create(
+        # Call the Groq API and stream the response as it is generated.
+        stream = client.chat.completions.create(
             messages=messages,
-            model=model
+            model=SETTINGS.default_groq_model,
+            stream=True
         )
-        # Extract the content of the response.
-        response = chat_completion.choices[0].message.content
-        logger.info("Prompt sent to LLM:\n%s", prompt)
-        logger.info("LLM raw response:\n%s", response)
-        # Remove any extraneous metadata (like <think> tags) from the response.
-        cleaned_response = re.sub(r'<think>.*?</think>\s*', '', response, flags=re.DOTALL).strip()
-        logger.info("Cleaned LLM response:\n%s", cleaned_response)
+        # Only build and log the full payloads when this call's level is enabled.
+        log_level = _llm_log_level()
+        log_payloads = logger.isEnabledFor(log_level)
+        if log_payloads:
+            logger.log(log_level, "Messages sent to LLM:\n%s", messages)
+        # Collect the raw text (if it will be logged) while stripping <think> blocks as the chunks arrive.
+        raw_parts = []
+
+        def content_chunks():
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if log_payloads:
+                        raw_parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+
+        cleaned_response = "".join(strip_think_blocks(content_chunks())).strip()
+        if log_payloads:
+            logger.log(log_level, "LLM raw response:\n%s", "".join(raw_parts))
+            logger.log(log_level, "Cleaned LLM response:\n%s", cleaned_response)
         return cleaned_response
     except Exception as e:
         # Log the error and propagate the exception.
@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+"""
+Gunicorn configuration for running the WhatsApp Bot in production.
+
+The webhook spends nearly all of its time waiting on network I/O (MongoDB, Groq,
+Twilio, SMTP), so gevent workers are used: each worker multiplexes many concurrent
+requests on cooperative greenlets, and the gevent worker monkey-patches the standard
+library (sockets, SSL, threads) at startup so the blocking client libraries yield
+while they wait.
+
+Usage:
+    gunicorn main:app
+
+Settings can be tuned with the environment variables below.
+"""
+
+import os
+
+# Address to bind to; PORT matches the variable used by `python main.py`.
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+# Cooperative workers for I/O-bound request handling.
+worker_class = "gevent"
+
+# Number of worker processes.
+workers = int(os.environ.get("GUNICORN_WORKERS", 4))
+
+# Maximum number of simultaneous connections handled by each worker.
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Allow slow LLM responses to complete before a worker is considered hung.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
@@ -6,15 +6,18 @@ This module processes incoming user messages by performing the following steps:
   1. Preprocess the incoming message (e.g., trimming whitespace).
   2. Check if the message contains media request keywords and send an alert notification if needed.
   3. Update the conversation summary with the new message.
-  4. Construct a prompt for the LLM by combining the conversation summary and the new message.
+  4. Construct the LLM chat messages from the conversation summary and the new message.
   5. Use the LLM integration to generate a natural, engaging response.
-  6. Update the conversation summary with the bot's generated response.
-  7. Return the generated response to be sent back to the user.
+  6. Return the generated response together with a deferred action that records the
+     bot's response in the conversation summary, so it can run after the reply is sent.
 
 By separating these concerns, the code remains modular, testable, and easier to maintain.
 """
 
+import re
 import logging
+from functools import partial
+from typing import Callable, Optional, Tuple
 from core import llm  # LLM integration module for generating responses
 from handlers import notification  # Module to send email notifications for alerts
 from utils import summarizer  # Module for maintaining and updating conversation summaries
@@ -22,6 +25,20 @@ from utils import summarizer  # Module for maintaining and updating conversation
 # Initialize a logger for this module
 logger = logging.getLogger(__name__)
 
+# Keywords that indicate the user is asking for media content.
+MEDIA_KEYWORDS = ("video", "photo", "voice")
+# Single compiled, case-insensitive matcher for all media keywords.
+_MEDIA_RE = re.compile("|".join(map(re.escape, MEDIA_KEYWORDS)), re.IGNORECASE)
+
+# Static instructions sent as the first message of every request. Keeping this text
+# identical across turns lets the provider reuse the cached prompt prefix.
+_SYSTEM_PROMPT = (
+    "You are engaged in a playful conversation with the user. "
+    "Use the conversation summary that follows to generate a natural and engaging reply "
+    "to the user's message. "
+    "Respond naturally while maintaining the tone of the conversation."
+)
+
 def preprocess_message(message_text: str) -> str:
     """
     Preprocess the incoming message by trimming any extra whitespace.
@@ -49,10 +66,9 @@ def check_media_request(message_text: str) -> bool:
     Returns:
         bool: True if a media request is detected, otherwise False.
     """
-    media_keywords = ["video", "photo", "voice"]
-    return any(keyword in message_text.lower() for keyword in media_keywords)
+    return _MEDIA_RE.search(message_text) is not None
 
-def process_message(message_text: str, user_id: str) -> str:
+def process_message(message_text: str, user_id: str) -> Tuple[str, Optional[Callable[[], None]]]:
     """
     Process an incoming message and generate an appropriate response using LLM.
 
@@ -60,21 +76,23 @@ def process_message(message_text: str, user_id: str) -> str:
       - Preprocesses the user's message.
       - Checks for media requests and triggers an email notification if needed.
       - Updates the conversation summary with the user's new message.
-      - Constructs a prompt that includes the conversation context and the latest message.
+      - Constructs chat messages that include the conversation context and the latest message.
       - Calls the LLM to generate a response.
-      - Updates the conversation summary with the generated response.
+      - Prepares a deferred action that updates the conversation summary with the generated response.
 
     Args:
         message_text (str): The text message from the user.
         user_id (str): A unique identifier for the user (typically their WhatsApp number).
 
     Returns:
-        str: The generated response from the LLM to be sent back to the user.
+        tuple: The generated response from the LLM to be sent back to the user, and a
+            callable to run once the response has been dispatched (or None if there is
+            nothing left to do).
     """
     # Extra check in process_message: if message_text is None, return a default response.
     if message_text is None:
         logger.warning("Received a None message_text in process_message for user %s.", user_id)
-        return "I didn't catch that. Could you please repeat?"
+        return "I didn't catch that. Could you please repeat?", None
 
     # Step 1: Preprocess the incoming message.
     processed_text = preprocess_message(message_text)
@@ -82,7 +100,7 @@ def process_message(message_text: str, user_id: str) -> str:
     # If there's no valid text after preprocessing, return a default message.
     if not processed_text:
         logger.info("No valid message text to process for user %s; returning default response.", user_id)
-        return "I didn't catch that. Could you please repeat?"
+        return "I didn't catch that. Could you please repeat?", None
 
     # Step 2: Check for media requests; if detected, send an alert email.
     if check_media_request(processed_text):
@@ -93,29 +111,23 @@ def process_message(message_text: str, user_id: str) -> str:
     # Step 3: Update the conversation summary with the user's new message.
     current_summary = summarizer.update_summary(user_id, processed_text, role="User")
 
-    # Step 4: Construct a prompt for the LLM.
-    prompt = (
-        "You are engaged in a playful conversation with the user. "
-        "Use the following conversation context to generate a natural and engaging reply.\n\n"
-        "Conversation Summary:\n"
-        f"{current_summary}\n\n"
-        "User's Message:\n"
-        f"{processed_text}\n\n"
-        "Respond naturally while maintaining the tone of the conversation."
-    )
+    # Step 4: Construct the chat messages for the LLM.
+    messages = [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "system", "content": f"Conversation Summary:\n{current_summary}"},
+        {"role": "user", "content": processed_text},
+    ]
 
     try:
         # Step 5: Generate a response using the LLM integration.
-        response = llm.get_llm_response(prompt)
+        response = llm.get_llm_response(messages)
     except Exception as e:
         subject = "LLM API Failure"
-        error_message = f"Error for user {user_id} with prompt: {prompt}\nError: {str(e)}"
+        error_message = f"Error for user {user_id} with messages: {messages}\nError: {str(e)}"
         notification.send_email_alert(subject, error_message)
         raise e
 
-    # Step 6: Update the conversation summary with the bot's response.
-    summarizer.update_summary(user_id, response, role="Bot")
-    logger.info("Updated conversation summary for user %s", user_id)
-
-    # Step 7: Return the generated response.
-    return response
+    # Step 6: Return the response and defer recording it in the conversation summary,
+    # so the caller can send the reply before paying for the database write.
+    post_actions = partial(summarizer.update_summary, user_id, response, role="Bot")
+    return response, post_actions
@@ -3,40 +3,147 @@
 Notification Handler Module
 
 This module sends email notifications for events such as media requests or system errors.
+
+Alerts are queued and delivered by a background worker thread that keeps a persistent
+SMTP connection open, so callers (e.g. the webhook) never wait on the SMTP handshake.
 """
 
+import queue
 import logging
 import smtplib
+import threading
 from email.mime.text import MIMEText
-from config import settings
+from config.settings import SETTINGS
 
 # Initialize a logger for this module
 logger = logging.getLogger(__name__)
 
+# SMTP server used to deliver alerts.
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 465
+
+# Seconds to wait on any SMTP connect or command before giving up, so a hung server cannot
+# block the alert worker (and every alert queued behind it) indefinitely.
+SMTP_TIMEOUT = 30
+
+# Seconds the worker waits for new alerts before sending a NOOP to keep the connection alive.
+KEEPALIVE_INTERVAL = 60
+
+# Pending (subject, message) alerts waiting to be sent.
+_alert_queue = queue.Queue()
+
+# Background worker thread, started on first use.
+_worker = None
+_worker_lock = threading.Lock()
+
+def _connect() -> smtplib.SMTP_SSL:
+    """
+    Open and authenticate a new SMTP-over-SSL connection.
+
+    Returns:
+        smtplib.SMTP_SSL: The logged-in SMTP connection.
+    """
+    # Connect to the Gmail SMTP server over SSL.
+    server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    # Log in using the email credentials from settings.
+    server.login(SETTINGS.email_sender, SETTINGS.email_password)
+    return server
+
+def _close(server) -> None:
+    """
+    Close an SMTP connection, ignoring errors from an already broken connection.
+
+    Args:
+        server (smtplib.SMTP_SSL): The connection to close, or None.
+    """
+    if server is None:
+        return
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+def _build_message(subject: str, message: str) -> MIMEText:
+    """
+    Create the email message for an alert.
+
+    Args:
+        subject (str): Subject of the email.
+        message (str): Message body containing details of the alert.
+
+    Returns:
+        MIMEText: The email ready to be sent.
+    """
+    msg = MIMEText(message)
+    msg['Subject'] = subject
+    msg['From'] = SETTINGS.email_sender
+    msg['To'] = SETTINGS.email_sender  # Typically, alerts are sent to the same email.
+    return msg
+
+def _worker_loop() -> None:
+    """
+    Deliver queued alerts over a persistent SMTP connection.
+
+    The connection is opened lazily, kept alive with NOOP while idle, and re-established
+    (with a single retry of the current alert) if the server disconnects.
+    """
+    server = None
+    while True:
+        try:
+            subject, message = _alert_queue.get(timeout=KEEPALIVE_INTERVAL)
+        except queue.Empty:
+            # Keep the idle connection alive; drop it if the server has gone away.
+            if server is not None:
+                try:
+                    server.noop()
+                except Exception:
+                    _close(server)
+                    server = None
+            continue
+
+        try:
+            msg = _build_message(subject, message)
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = _connect()
+                    # Send the email message.
+                    server.send_message(msg)
+                    logger.info("Email alert sent: %s", subject)
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    # The persistent connection was dropped; reconnect and retry once.
+                    server = None
+                    if attempt:
+                        raise
+        except Exception:
+            # Log any errors that occur during the email sending process.
+            logger.error("Failed to send email alert", exc_info=True)
+            _close(server)
+            server = None
+        finally:
+            _alert_queue.task_done()
+
+def start_worker() -> None:
+    """
+    Start the background alert worker if it is not already running.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="email-alerts", daemon=True)
+            _worker.start()
+
 def send_email_alert(subject: str, message: str) -> None:
     """
-    Send an email alert with the specified subject and message.
+    Queue an email alert with the specified subject and message.
 
     Args:
         subject (str): Subject of the email.
         message (str): Message body containing details of the alert.
 
-    This function creates and sends an email using SMTP over SSL.
+    The alert is handed to a background worker that sends it using SMTP over SSL,
+    so this function returns immediately.
     """
-    try:
-        # Create a MIMEText object to represent the email.
-        msg = MIMEText(message)
-        msg['Subject'] = subject
-        msg['From'] = settings.EMAIL_SENDER
-        msg['To'] = settings.EMAIL_SENDER  # Typically, alerts are sent to the same email.
-
-        # Connect to the Gmail SMTP server over SSL.
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            # Log in using the email credentials from settings.
-            server.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
-            # Send the email message.
-            server.send_message(msg)
-        logger.info("Email alert sent: %s", subject)
-    except Exception as e:
-        # Log any errors that occur during the email sending process.
-        logger.error("Failed to send email alert", exc_info=True)
+    start_worker()
+    _alert_queue.put_nowait((subject, message))
@@ -16,34 +16,112 @@ Key functionalities:
     - Ensures the phone number is properly formatted using a format check.
 """
 
+import re
+import atexit
+import queue
 import logging
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
+from pymongo.errors import OperationFailure, PyMongoError
 from handlers import message as message_handler  # Module for processing messages
-from utils import rate_limiter  # Module for in-memory rate limiting
+from handlers import notification  # Module for email alerts
+from utils import summarizer  # Module for conversation summaries
+from core import database, llm  # Shared MongoDB and Groq clients
+from utils import rate_limiter  # Module for sliding-window rate limiting
 from twilio.rest import Client  # Twilio's Python SDK for sending messages
-from config import settings  # Configuration settings
+from config.settings import SETTINGS  # Configuration settings
 import os
 
 # Initialize the Flask application
 app = Flask(__name__)
 
-# Configure logging to include timestamps, module names, log levels, and messages
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Configure logging to include timestamps, module names, log levels, and messages.
+# Records are handed to a queue and written by a listener thread, so log I/O does
+# not block request handling.
+log_queue = queue.Queue(-1)
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+log_listener = QueueListener(log_queue, log_stream_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
-# Initialize the Twilio client using credentials from the configuration
-twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+# Initialize the Twilio client using credentials from the configuration. Its default
+# HTTP client keeps a persistent requests.Session, so connections to the Twilio API
+# are reused across messages.
+twilio_client = Client(SETTINGS.twilio_account_sid, SETTINGS.twilio_auth_token)
 
+# Worker pool for follow-up work (e.g. summary write-back) that runs after the reply is sent.
+post_action_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="post-action")
 
+# Per-user queues of pending follow-up work. Each user's queue is drained by one worker at a
+# time, so the writes for a given user are applied in the order their messages were handled.
+post_action_queues = {}
+post_action_lock = threading.Lock()
+
+# Matches every run of non-digit characters in a phone number.
+_NON_DIGITS_RE = re.compile(r'\D+')
+
+
+def init_app() -> None:
+    """
+    Eagerly create the external clients so the first webhook call does not pay their setup cost.
+
+    This builds the Groq client, opens the MongoDB connection (forcing the TLS handshake
+    with a ping) and starts the email alert and summary batch writer threads. Failures
+    are logged rather than raised, since each client is still created lazily on first use.
+    """
+    try:
+        llm.get_client()
+    except Exception:
+        app.logger.error("Failed to initialize the Groq client at startup", exc_info=True)
+
+    try:
+        database.get_client().admin.command('ping')
+    except Exception:
+        app.logger.error("Failed to connect to MongoDB at startup", exc_info=True)
+
+    notification.start_worker()
+    summarizer.start_batch_writer()
+    app.logger.info("External clients initialized.")
+
+
+def ensure_database_indexes() -> None:
+    """
+    Create the database indexes the application relies on.
+
+    A failed index build (e.g. because duplicate user_id records already exist) is fatal:
+    without the unique index, concurrent upserts can create duplicate summary records.
+    If MongoDB cannot be reached, the error is logged and startup continues.
+
+    Raises:
+        OperationFailure: If MongoDB rejects the index build.
+    """
+    try:
+        database.ensure_indexes()
+    except OperationFailure:
+        app.logger.critical(
+            "Failed to build the unique index on conversation_summaries.user_id; "
+            "check for duplicate user_id records",
+            exc_info=True
+        )
+        raise
+    except PyMongoError:
+        app.logger.error("Could not reach MongoDB to ensure the conversation_summaries.user_id index", exc_info=True)
+
+
+@lru_cache(maxsize=1024)
 def format_phone_number(phone_number: str) -> str:
     """
     Ensure the phone number is in the correct WhatsApp format: "whatsapp:+{number}".
 
-    This function trims any whitespace, ensures the number starts with "whatsapp:",
-    and removes any spaces in the number portion. If the number after the prefix does
-    not start with a '+', it will add one.
+    This function drops the optional "whatsapp:" prefix, the '+' sign, whitespace and
+    any other non-digit characters, then rebuilds the number in the expected format.
+    Results are memoized since the same numbers recur across conversation turns.
 
     Args:
         phone_number (str): The phone number to format.
@@ -51,24 +129,17 @@ def format_phone_number(phone_number: str) -> str:
     Returns:
         str: The formatted phone number.
     """
-    # Remove leading/trailing whitespace from the entire input.
-    phone_number = phone_number.strip()
+    # The "whatsapp:" prefix contains no digits, so stripping non-digits removes it too.
+    digits = _NON_DIGITS_RE.sub('', phone_number)
+    return f"whatsapp:+{digits}"
 
-    # Ensure the phone number starts with "whatsapp:".
-    if not phone_number.startswith("whatsapp:"):
-        phone_number = "whatsapp:" + phone_number
 
-    # Get the part of the number after "whatsapp:" and remove any spaces.
-    prefix_length = len("whatsapp:")
-    number_without_prefix = phone_number[prefix_length:].strip().replace(" ", "")
+# Ensure the database indexes exist at import time, regardless of EAGER_INIT.
+ensure_database_indexes()
 
-    # If the number doesn't start with '+', add it.
-    if not number_without_prefix.startswith("+"):
-        number_without_prefix = "+" + number_without_prefix
-
-    # Return the properly formatted number.
-    formatted = "whatsapp:" + number_without_prefix
-    return formatted
+# Warm up external clients at import time (covers both `python main.py` and gunicorn).
+if SETTINGS.eager_init:
+    init_app()
 
 
 @app.route('/webhook', methods=['POST'])
@@ -83,6 +154,7 @@ def webhook():
       - Applies rate limiting to avoid abuse.
       - Processes the message via the message handler.
       - Sends the generated response back to the sender using Twilio.
+      - Runs any follow-up work from the message handler in the background.
     """
     try:
         # Twilio sends data as URL-encoded form data by default.
@@ -101,7 +173,7 @@ def webhook():
             return jsonify({"status": "ignored"}), 200
 
         # Ignore messages coming from our own Twilio WhatsApp number.
-        if user_id == settings.TWILIO_WHATSAPP_NUMBER:
+        if user_id == SETTINGS.twilio_whatsapp_number:
             app.logger.warning("Ignoring message from our own Twilio number: %s", user_id)
             return jsonify({"status": "ignored"}), 200
 
@@ -111,11 +183,15 @@ def webhook():
             return jsonify({"status": "rate_limited"}), 429
 
         # Process the message using our message handler.
-        response_text = message_handler.process_message(message_text, user_id)
+        response_text, post_actions = message_handler.process_message(message_text, user_id)
 
         # Send the generated response back via Twilio.
         send_whatsapp_message(user_id, response_text)
 
+        # Run follow-up work (such as recording the reply in the summary) off the request path.
+        if post_actions is not None:
+            submit_post_actions(user_id, post_actions)
+
         return jsonify({"status": "success"}), 200
 
     except Exception as e:
@@ -124,6 +200,45 @@ def webhook():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def submit_post_actions(user_id: str, post_actions) -> None:
+    """
+    Queue follow-up work for a user, starting a worker for that user if none is running.
+
+    Args:
+        user_id (str): The sender the follow-up work belongs to.
+        post_actions (Callable): The callable returned by the message handler.
+    """
+    with post_action_lock:
+        pending = post_action_queues.get(user_id)
+        if pending is not None:
+            # A worker is already draining this user's queue; it will pick this up in order.
+            pending.append(post_actions)
+            return
+        post_action_queues[user_id] = deque([post_actions])
+    post_action_executor.submit(run_post_actions, user_id)
+
+
+def run_post_actions(user_id: str) -> None:
+    """
+    Execute a user's queued follow-up work in order, logging any failure.
+
+    Args:
+        user_id (str): The sender whose queued follow-up work should be run.
+    """
+    while True:
+        with post_action_lock:
+            pending = post_action_queues[user_id]
+            if not pending:
+                del post_action_queues[user_id]
+                return
+            post_actions = pending.popleft()
+        try:
+            post_actions()
+            app.logger.info("Updated conversation summary for user %s", user_id)
+        except Exception as e:
+            app.logger.error("Post-processing failed for user %s: %s", user_id, str(e), exc_info=True)
+
+
 def send_whatsapp_message(to_number: str, message_body: str):
     """
     Sends a WhatsApp message using Twilio's API.
@@ -142,7 +257,7 @@ def send_whatsapp_message(to_number: str, message_body: str):
         # Create and send the message using Twilio's messaging service.
         message = twilio_client.messages.create(
             body=message_body,
-            from_=settings.TWILIO_WHATSAPP_NUMBER,  # Your Twilio WhatsApp-enabled number
+            from_=SETTINGS.twilio_whatsapp_number,  # Your Twilio WhatsApp-enabled number
             to=formatted_to_number
         )
         app.logger.info("Sent message to %s with SID: %s", formatted_to_number, message.sid)
@@ -153,6 +268,7 @@ def send_whatsapp_message(to_number: str, message_body: str):
 
 
 if __name__ == '__main__':
+    # Development server only; in production run `gunicorn main:app` (see gunicorn.conf.py).
     port = int(os.environ.get("PORT", 5001))
     app.run(debug=True, host="0.0.0.0", port=port)
 
@@ -2,24 +2,109 @@
 """
 Rate Limiter Module
 
-This module implements a basic in-memory rate limiting mechanism to control the number
+This module implements a sliding-window rate limiting mechanism to control the number
 of messages a user can send within a given time frame.
+
+When REDIS_URL is configured, each user's window is stored in a Redis sorted set so the
+limit is shared across worker processes and survives restarts. Otherwise, timestamps
+are tracked in memory for the current process only.
 """
 
 import time
+import uuid
 import logging
-from config import settings
+from collections import defaultdict, deque
+from config.settings import SETTINGS
 
 # Initialize a logger for this module
 logger = logging.getLogger(__name__)
 
-# Dictionary to store lists of timestamps for each user's messages.
-user_message_timestamps = {}
+# Length of the sliding rate limit window, in seconds.
+WINDOW_SECONDS = 3600
+
+# Maximum number of messages allowed per user within the window.
+RATE_LIMIT_PER_HOUR = SETTINGS.default_rate_limit_per_hour
+
+# Prefix for the Redis sorted-set keys holding each user's message timestamps.
+REDIS_KEY_PREFIX = "limits:"
+
+# Seconds to wait when connecting to or reading from Redis before giving up, so an
+# unreachable Redis cannot stall the webhook.
+REDIS_SOCKET_TIMEOUT = 0.5
+
+# Per-user deques of message timestamps, oldest first (in-memory fallback).
+user_message_timestamps = defaultdict(deque)
+
+# Shared Redis client (backed by a connection pool), or None to use in-memory tracking.
+if SETTINGS.redis_url:
+    import redis
+    redis_client = redis.Redis.from_url(
+        SETTINGS.redis_url,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT
+    )
+else:
+    redis_client = None
 
 def is_rate_limited(user_id: str) -> bool:
     """
     Check if a user has exceeded the rate limit.
 
+    If Redis is configured but fails (e.g. it is unreachable or times out), the check
+    falls back to this process's in-memory tracking instead of failing the request.
+
+    Args:
+        user_id (str): Unique identifier for the user (e.g., their WhatsApp number).
+
+    Returns:
+        bool: True if the user is rate limited, False otherwise.
+    """
+    if redis_client is not None:
+        try:
+            return _is_rate_limited_redis(user_id)
+        except redis.RedisError:
+            logger.error("Redis rate limit check failed for user %s; using in-memory tracking.", user_id, exc_info=True)
+    return _is_rate_limited_in_memory(user_id)
+
+def _is_rate_limited_redis(user_id: str) -> bool:
+    """
+    Sliding-window rate limit check backed by a Redis sorted set.
+
+    The expired entries are trimmed, the current message is recorded and the window is
+    counted in a single pipelined round trip. If the limit is exceeded, the message just
+    recorded is removed again so rejected messages do not extend the block.
+
+    Args:
+        user_id (str): Unique identifier for the user (e.g., their WhatsApp number).
+
+    Returns:
+        bool: True if the user is rate limited, False otherwise.
+    """
+    current_time = time.time()
+    key = REDIS_KEY_PREFIX + user_id
+    # Use a unique member so messages arriving at the same timestamp are counted separately.
+    member = f"{current_time}:{uuid.uuid4().hex}"
+
+    pipe = redis_client.pipeline()
+    pipe.zremrangebyscore(key, 0, current_time - WINDOW_SECONDS)
+    pipe.zadd(key, {member: current_time})
+    pipe.zcard(key)
+    # Let keys of users who stop messaging expire on their own.
+    pipe.expire(key, WINDOW_SECONDS)
+    _, _, count, _ = pipe.execute()
+
+    logger.debug("Current rate for user %s: %s", user_id, count)
+
+    # If the number of messages in the past hour exceeds the limit, rate limit the user.
+    if count > RATE_LIMIT_PER_HOUR:
+        redis_client.zrem(key, member)
+        return True
+    return False
+
+def _is_rate_limited_in_memory(user_id: str) -> bool:
+    """
+    Sliding-window rate limit check using per-process in-memory timestamps.
+
     Args:
         user_id (str): Unique identifier for the user (e.g., their WhatsApp number).
 
@@ -27,19 +112,19 @@ def is_rate_limited(user_id: str) -> bool:
         bool: True if the user is rate limited, False otherwise.
     """
     current_time = time.time()
-    # Retrieve the list of timestamps for this user, defaulting to an empty list.
-    timestamps = user_message_timestamps.get(user_id, [])
-    # Keep only timestamps within the last hour (3600 seconds).
-    timestamps = [timestamp for timestamp in timestamps if current_time - timestamp < 3600]
-    user_message_timestamps[user_id] = timestamps
+    cutoff = current_time - WINDOW_SECONDS
+    # Retrieve the deque of timestamps for this user (created empty on first use).
+    timestamps = user_message_timestamps[user_id]
+    # Drop timestamps that have fallen out of the window; they are ordered oldest first.
+    while timestamps and timestamps[0] <= cutoff:
+        timestamps.popleft()
 
-    logger.debug("Current rate for user %s: %s", user_id, user_message_timestamps[user_id])
+    logger.debug("Current rate for user %s: %s", user_id, len(timestamps))
 
     # If the number of messages in the past hour reaches or exceeds the limit, rate limit the user.
-    if len(timestamps) >= settings.DEFAULT_RATE_LIMIT_PER_HOUR:
+    if len(timestamps) >= RATE_LIMIT_PER_HOUR:
         return True
 
     # Otherwise, record the current timestamp and allow the message.
     timestamps.append(current_time)
-    user_message_timestamps[user_id] = timestamps
     return False
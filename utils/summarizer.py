@@ -11,12 +11,18 @@ Database Schema (collection: "conversation_summaries"):
     - user_id: Unique identifier for the user.
     - summary: Current conversation summary text.
     - unsummarized_count: Number of new messages since the last summary update.
-    - buffer: Concatenated new interactions not yet incorporated into the summary.
+    - buffer: List of the most recent interactions not yet incorporated into the summary
+      (capped at BUFFER_MAX_ENTRIES entries).
 """
 
 import time
 import logging
-from core.database import get_db
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from core.database import get_summaries_collection
 from core.llm import get_llm_response
 
 # Initialize a logger for this module
@@ -25,9 +31,147 @@ logger = logging.getLogger(__name__)
 # Define the threshold for the number of messages before updating the summary.
 UPDATE_THRESHOLD = 3
 
-def update_summary(user_id: str, new_message: str, role: str = "User") -> str:
+# Maximum number of interactions kept in a user's buffer; older entries are dropped.
+BUFFER_MAX_ENTRIES = 20
+
+# Worker pool that runs resummarization off the webhook request path.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarizer")
+
+# Users with a resummarization job currently queued or running, guarded by a lock.
+_pending_users = set()
+_pending_lock = threading.Lock()
+
+# Buffer appends are coalesced into bulk_writes of at most BATCH_MAX_OPS operations. An
+# append that arrives while the writer is idle is flushed immediately; appends that queue
+# up while a flush is in progress are held for up to BATCH_WINDOW seconds afterwards so
+# more of them can join the next batch.
+BATCH_WINDOW = 0.02
+BATCH_MAX_OPS = 100
+
+# MongoDB error code for a duplicate key (e.g. two concurrent upserts of a new user).
+DUPLICATE_KEY_ERROR = 11000
+
+# Appends waiting to be flushed, oldest first, and the condition used to signal the writer.
+_pending_writes = deque()
+_pending_writes_ready = threading.Condition()
+
+# Background batch writer thread, started on first use.
+_batch_writer = None
+_batch_writer_lock = threading.Lock()
+
+def _flush_batch(batch: list) -> None:
     """
-    Update the conversation summary for a user with a new interaction.
+    Apply a batch of buffer appends with one bulk_write and hand each caller its record.
+
+    The post-update records of the users whose callers need them (see append_to_buffer)
+    are fetched with a single query; batches without such items skip that query.
+    Appends that fail with a duplicate key error (concurrent upserts of a new user) are
+    requeued once; other failures are reported to the waiting caller.
+
+    Args:
+        batch (list): Pending append items, as created by append_to_buffer.
+    """
+    collection = get_summaries_collection()
+    try:
+        collection.bulk_write([item["op"] for item in batch], ordered=False)
+        failed = {}
+    except BulkWriteError as e:
+        failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+    except Exception as e:
+        for item in batch:
+            item["error"] = e
+            item["done"].set()
+        return
+
+    retry = []
+    for index, error in failed.items():
+        item = batch[index]
+        if error.get("code") == DUPLICATE_KEY_ERROR and not item["retried"]:
+            item["retried"] = True
+            retry.append(item)
+        else:
+            item["error"] = OperationFailure(error.get("errmsg"), error.get("code"))
+            item["done"].set()
+    if retry:
+        with _pending_writes_ready:
+            _pending_writes.extendleft(reversed(retry))
+            _pending_writes_ready.notify()
+
+    completed = [item for index, item in enumerate(batch) if index not in failed]
+    # Callers that do not need the post-update record are done once the write succeeds.
+    for item in completed:
+        if not item["fetch_record"]:
+            item["done"].set()
+    completed = [item for item in completed if item["fetch_record"]]
+    if not completed:
+        return
+    try:
+        user_ids = list({item["user_id"] for item in completed})
+        records = {
+            record["user_id"]: record
+            for record in collection.find({"user_id": {"$in": user_ids}}, projection={"buffer": False})
+        }
+    except Exception as e:
+        for item in completed:
+            item["error"] = e
+            item["done"].set()
+        return
+    for item in completed:
+        item["record"] = records.get(item["user_id"], {})
+        item["done"].set()
+
+def _batch_writer_loop() -> None:
+    """
+    Flush pending appends in batches of at most BATCH_MAX_OPS.
+
+    When the writer was idle, the first append is flushed right away so a lone message
+    pays no batching delay. Only when appends queued up during the previous flush (i.e.
+    under concurrent load) does the writer wait up to BATCH_WINDOW seconds to fill the
+    next batch.
+    """
+    while True:
+        with _pending_writes_ready:
+            # Appends already waiting here arrived while the previous flush was in progress.
+            under_load = bool(_pending_writes)
+            while not _pending_writes:
+                _pending_writes_ready.wait()
+            if under_load:
+                # Give concurrent appends a short window to join this batch.
+                deadline = time.monotonic() + BATCH_WINDOW
+                while len(_pending_writes) < BATCH_MAX_OPS:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    _pending_writes_ready.wait(remaining)
+            batch = [_pending_writes.popleft() for _ in range(min(len(_pending_writes), BATCH_MAX_OPS))]
+        try:
+            _flush_batch(batch)
+        except Exception as e:
+            logger.error("Failed to flush summary buffer batch", exc_info=True)
+            for item in batch:
+                if not item["done"].is_set():
+                    item["error"] = e
+                    item["done"].set()
+
+def start_batch_writer() -> None:
+    """
+    Start the background batch writer if it is not already running.
+    """
+    global _batch_writer
+    with _batch_writer_lock:
+        if _batch_writer is None or not _batch_writer.is_alive():
+            _batch_writer = threading.Thread(target=_batch_writer_loop, name="summary-writer", daemon=True)
+            _batch_writer.start()
+
+def append_to_buffer(user_id: str, new_message: str, role: str = "User"):
+    """
+    Append a new interaction to the user's buffer with a single atomic upsert.
+
+    The upsert is queued and applied together with other appends arriving at about the
+    same time in one bulk_write; this call blocks until its batch has been written.
+    The buffer itself is never sent back to the client; the returned record only
+    carries the summary and counters. Only user messages can move the count past the
+    summary threshold, so the record is not fetched after bot appends.
 
     Args:
         user_id (str): Unique identifier for the user.
@@ -35,69 +179,196 @@ def update_summary(user_id: str, new_message: str, role: str = "User") -> str:
         role (str): Role of the sender ("User" or "Bot").
 
     Returns:
-        str: The updated conversation summary after processing the new message.
+        dict: The user's summary record after the update, without the buffer, or None
+            for bot messages.
+
+    Raises:
+        Exception: If the batched write fails.
     """
-    db = get_db()
-    # Access the 'conversation_summaries' collection from the database.
-    collection = db.conversation_summaries
+    # Append the new message to the buffer, prefixed by the sender's role.
+    new_entry = f"{role}: {new_message}"
+    # Only messages from the user count towards the summary threshold.
+    increment = 1 if role == "User" else 0
 
-    # Attempt to retrieve an existing summary record for the user.
-    record = collection.find_one({"user_id": user_id})
-    if not record:
-        # If no record exists, create a new one with default values.
-        record = {
-            "user_id": user_id,
-            "summary": "",
-            "unsummarized_count": 0,
-            "buffer": ""
-        }
-        collection.insert_one(record)
+    # Append to the buffer, bump the counter and create the record if it does not exist.
+    # The server appends to the capped buffer array, so the existing entries never have to
+    # be read back first. A non-empty buffer in the legacy string format is kept as the
+    # first entry of the new array, so its pending interactions still reach the next summary.
+    op = UpdateOne(
+        {"user_id": user_id},
+        [{"$set": {
+            "summary": {"$ifNull": ["$summary", ""]},
+            "buffer": {"$slice": [
+                {"$concatArrays": [
+                    {"$cond": [
+                        {"$isArray": "$buffer"},
+                        "$buffer",
+                        {"$cond": [
+                            {"$and": [
+                                {"$eq": [{"$type": "$buffer"}, "string"]},
+                                {"$ne": ["$buffer", ""]}
+                            ]},
+                            [{"$trim": {"input": "$buffer"}}],
+                            []
+                        ]}
+                    ]},
+                    [{"$literal": new_entry}]
+                ]},
+                -BUFFER_MAX_ENTRIES
+            ]},
+            "unsummarized_count": {"$add": [{"$ifNull": ["$unsummarized_count", 0]}, increment]},
+            "last_updated": time.time()
+        }}],
+        upsert=True
+    )
+    item = {
+        "op": op,
+        "user_id": user_id,
+        "fetch_record": bool(increment),
+        "done": threading.Event(),
+        "record": None,
+        "error": None,
+        "retried": False
+    }
 
-    # Append the new message to the buffer, prefixed by the sender's role.
-    new_entry = f"{role}: {new_message}\n"
-    updated_buffer = record.get("buffer", "") + new_entry
+    start_batch_writer()
+    with _pending_writes_ready:
+        _pending_writes.append(item)
+        _pending_writes_ready.notify()
+    item["done"].wait()
+
+    if item["error"] is not None:
+        raise item["error"]
+    return item["record"]
+
+def resummarize_if_needed(user_id: str) -> str:
+    """
+    Fold the buffered interactions into the summary if the threshold has been reached.
+
+    Only the part of the buffer that was summarized is removed, so messages appended
+    while the LLM call is in flight are kept for the next round. The write is
+    conditional on the summary being unchanged, which makes concurrent runs for the
+    same user idempotent.
+
+    Args:
+        user_id (str): Unique identifier for the user.
+
+    Returns:
+        str: The user's summary after processing.
+    """
+    collection = get_summaries_collection()
+    record = collection.find_one({"user_id": user_id}) or {}
 
-    # Increment the unsummarized message count if the message is from the user.
     unsummarized_count = record.get("unsummarized_count", 0)
-    if role == "User":
-        unsummarized_count += 1
-
-    # Prepare fields to update in the database.
-    update_fields = {
-        "buffer": updated_buffer,
-        "unsummarized_count": unsummarized_count,
-        "last_updated": time.time()
-    }
+    current_summary = record.get("summary", "")
+    if unsummarized_count < UPDATE_THRESHOLD:
+        return current_summary
 
-    # If the unsummarized count meets or exceeds the threshold, update the summary.
-    if unsummarized_count >= UPDATE_THRESHOLD:
-        logger.info("Threshold reached for user %s (%s messages). Updating summary.", user_id, unsummarized_count)
-        current_summary = record.get("summary", "")
-        # Construct a prompt that instructs the LLM to generate an updated summary.
-        prompt = (
+    logger.info("Threshold reached for user %s (%s messages). Updating summary.", user_id, unsummarized_count)
+    buffer = record.get("buffer") or []
+    interactions = "\n".join(buffer)
+    # Construct messages that instruct the LLM to generate an updated summary.
+    messages = [
+        {"role": "system", "content": (
             "You are tasked with summarizing the conversation between a user and a bot. "
             "Below is the current summary and the new interactions since the last summary update. "
-            "Generate an updated, concise summary that captures all key points and changes in context.\n"
-            f"Current Summary: {current_summary}\n"
-            f"New Interactions: {updated_buffer}\n"
+            "Generate an updated, concise summary that captures all key points and changes in context. "
             "Output only the new summary text."
-        )
-        try:
-            # Generate the new summary using the LLM.
-            new_summary = get_llm_response(prompt)
-            update_fields["summary"] = new_summary
-            update_fields["unsummarized_count"] = 0
-            update_fields["buffer"] = ""
-            updated_summary = new_summary
-            logger.info("Summary updated for user %s.", user_id)
-        except Exception as e:
-            # If LLM fails, retain the existing summary.
-            updated_summary = current_summary
-            logger.error("Failed to update summary for user %s. Keeping existing summary.", user_id, exc_info=True)
+        )},
+        {"role": "user", "content": (
+            f"Current Summary: {current_summary}\n"
+            f"New Interactions: {interactions}"
+        )},
+    ]
+    try:
+        # Generate the new summary using the LLM.
+        new_summary = get_llm_response(messages)
+    except Exception as e:
+        # If LLM fails, retain the existing summary.
+        logger.error("Failed to update summary for user %s. Keeping existing summary.", user_id, exc_info=True)
+        return current_summary
+
+    # Store the new summary and drop the summarized entries from the front of the buffer,
+    # keeping anything appended while the LLM call was in flight. The kept slice starts
+    # right after the summarized entries (clamped to the current size). If the cap drops
+    # entries from the front during the call, this offset shifts and a few of the new
+    # entries are dropped along with the summarized ones.
+    result = collection.update_one(
+        {
+            "user_id": user_id,
+            "summary": current_summary,
+            "unsummarized_count": {"$gte": UPDATE_THRESHOLD}
+        },
+        [{"$set": {
+            "summary": {"$literal": new_summary},
+            "buffer": {"$slice": [
+                "$buffer",
+                {"$min": [len(buffer), {"$size": "$buffer"}]},
+                BUFFER_MAX_ENTRIES
+            ]},
+            "unsummarized_count": {"$max": [0, {"$subtract": ["$unsummarized_count", unsummarized_count]}]},
+            "last_updated": time.time()
+        }}]
+    )
+    if result.modified_count:
+        logger.info("Summary updated for user %s.", user_id)
+        return new_summary
+    logger.info("Summary for user %s was already updated concurrently; discarding result.", user_id)
+    return current_summary
+
+def _run_resummarization(user_id: str) -> None:
+    """
+    Worker entry point: resummarize and release the user's pending slot.
+
+    Args:
+        user_id (str): Unique identifier for the user.
+    """
+    try:
+        resummarize_if_needed(user_id)
+    except Exception:
+        logger.error("Background summary update failed for user %s.", user_id, exc_info=True)
+    finally:
+        with _pending_lock:
+            _pending_users.discard(user_id)
+
+def schedule_resummarization(user_id: str) -> None:
+    """
+    Queue a background resummarization for the user unless one is already pending.
+
+    Args:
+        user_id (str): Unique identifier for the user.
+    """
+    with _pending_lock:
+        if user_id in _pending_users:
+            return
+        _pending_users.add(user_id)
+    _executor.submit(_run_resummarization, user_id)
+
+def update_summary(user_id: str, new_message: str, role: str = "User") -> str:
+    """
+    Update the conversation summary for a user with a new interaction.
+
+    The new message is appended synchronously; if the threshold is reached, the
+    LLM-based resummarization is handed off to a background worker so the caller
+    does not wait on it.
+
+    Args:
+        user_id (str): Unique identifier for the user.
+        new_message (str): The new message text to incorporate.
+        role (str): Role of the sender ("User" or "Bot").
+
+    Returns:
+        str: The currently stored conversation summary, or an empty string for bot
+            messages (their append does not read the record back).
+    """
+    record = append_to_buffer(user_id, new_message, role)
+    if record is None:
+        # Bot messages do not count towards the threshold, so there is nothing to check.
+        return ""
+
+    unsummarized_count = record.get("unsummarized_count", 0)
+    if unsummarized_count >= UPDATE_THRESHOLD:
+        schedule_resummarization(user_id)
     else:
-        updated_summary = record.get("summary", "")
         logger.info("Summary not updated for user %s. Unsummarized count: %s", user_id, unsummarized_count)
-
-    # Update the record in the database with the new summary data.
-    collection.update_one({"user_id": user_id}, {"$set": update_fields})
-    return updated_summary
+    return record.get("summary", "")